@@ -1,8 +1,14 @@
 
 
+import hashlib
+import heapq
+import itertools
 import json
 import os
+import random
 import shutil
+import struct
+import sys
 import threading
 import time
 from pathlib import Path
@@ -50,7 +56,96 @@ def salvar_config(config):
         json.dump(config, f, indent=2, ensure_ascii=False)
 
 
-def mover_arquivo(caminho_origem, pasta_destino, logger=None):
+BLOCO_COPIA = 1024 * 1024
+AMOSTRAS_VERIFICACAO = 8
+MODOS_VERIFICACAO = ("completo", "amostras")
+
+
+def _descartar_cache(f):
+    # Sem isso a releitura viria do cache de páginas, não do disco. No Windows
+    # não há posix_fadvise: lá a verificação só confirma a cópia em cache, o
+    # que ainda pega erros de leitura/escrita, mas não corrupção no próprio disco.
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            return True
+        except OSError:
+            pass
+    return False
+
+
+# Copia calculando o hash durante a cópia e só apaga a origem depois de conferir
+# o destino. "completo" relê o destino inteiro; "amostras" faz fsync e relê só
+# alguns blocos (primeiro, último e outros sorteados).
+def mover_verificado(origem, destino, modo="completo"):
+    tamanho = os.path.getsize(origem)
+    total_blocos = max(1, -(-tamanho // BLOCO_COPIA))
+    if modo == "amostras":
+        amostras = {0, total_blocos - 1}
+        amostras.update(random.sample(range(total_blocos), min(total_blocos, AMOSTRAS_VERIFICACAO)))
+    else:
+        amostras = None
+
+    fd = open(destino, "xb")
+    try:
+        inicio = time.perf_counter()
+        hash_origem = hashlib.blake2b()
+        hashes_blocos = {}
+        with open(origem, "rb") as fo, fd:
+            indice = 0
+            while True:
+                bloco = fo.read(BLOCO_COPIA)
+                if not bloco:
+                    break
+                fd.write(bloco)
+                if amostras is None:
+                    hash_origem.update(bloco)
+                elif indice in amostras:
+                    hashes_blocos[indice] = hashlib.blake2b(bloco).digest()
+                indice += 1
+            fd.flush()
+            os.fsync(fd.fileno())
+            do_disco = _descartar_cache(fd)
+        shutil.copystat(origem, destino)
+        tempo_copia = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        relidos = 0
+        with open(destino, "rb") as fd:
+            if amostras is None:
+                hash_destino = hashlib.blake2b()
+                for bloco in iter(lambda: fd.read(BLOCO_COPIA), b""):
+                    hash_destino.update(bloco)
+                    relidos += len(bloco)
+                ok = hash_destino.digest() == hash_origem.digest()
+            else:
+                ok = os.fstat(fd.fileno()).st_size == tamanho
+                for indice, esperado in hashes_blocos.items():
+                    fd.seek(indice * BLOCO_COPIA)
+                    bloco = fd.read(BLOCO_COPIA)
+                    relidos += len(bloco)
+                    if hashlib.blake2b(bloco).digest() != esperado:
+                        ok = False
+                        break
+        tempo_verificacao = time.perf_counter() - inicio
+
+        if not ok:
+            raise OSError(f"verificação da cópia falhou ({modo}): {destino}")
+        # Origem travada (Windows): sem remover o destino, cada nova tentativa
+        # deixaria mais uma cópia completa para trás.
+        os.remove(origem)
+    except BaseException:
+        fd.close()
+        try:
+            os.remove(destino)
+        except OSError:
+            pass
+        raise
+    return tamanho, relidos, tempo_copia, tempo_verificacao, do_disco
+
+
+def mover_arquivo(caminho_origem, pasta_destino, logger=None, verificacao=None):
+    alvo = None
     try:
         os.makedirs(pasta_destino, exist_ok=True)
         nome = os.path.basename(caminho_origem)
@@ -65,20 +160,492 @@ def mover_arquivo(caminho_origem, pasta_destino, logger=None):
                 if not os.path.exists(destino):
                     break
                 i += 1
+        # Na mesma unidade o move é só um rename; a verificação vale para outro disco.
+        if verificacao in MODOS_VERIFICACAO and os.stat(caminho_origem).st_dev != os.stat(pasta_destino).st_dev:
+            copiados, relidos, tempo_copia, tempo_verificacao, do_disco = mover_verificado(
+                caminho_origem, destino, verificacao)
+            if logger:
+                origem_releitura = "do disco" if do_disco else "do cache"
+                logger(f"📂 {nome} → {pasta_destino} (🔐 {verificacao}: {relidos / 1e6:.1f} de "
+                       f"{copiados / 1e6:.1f} MB relidos {origem_releitura} em {tempo_verificacao:.2f}s, "
+                       f"cópia {tempo_copia:.2f}s)")
+            return destino
+        # mover_verificado já limpa o que criou; aqui só o shutil.move pode
+        # deixar uma cópia para trás.
+        alvo = destino
         shutil.move(caminho_origem, destino)
         if logger:
             logger(f"📂 {nome} → {pasta_destino}")
+        return destino
     except Exception as e:
+        # Com a origem travada, o shutil.move copia e falha só no unlink: descarta
+        # a cópia para que a próxima tentativa não crie outro "nome (i)". Se o
+        # destino já existia (criado por outro nesse meio tempo), não é nosso.
+        if alvo and not isinstance(e, FileExistsError) \
+                and os.path.exists(caminho_origem) and os.path.exists(alvo):
+            try:
+                os.remove(alvo)
+            except OSError:
+                pass
         if logger:
             logger(f"❌ Erro ao mover {caminho_origem}: {e}")
+        return None
+
+
+
+class AgendadorRetentativas:
+    # Uma única thread atende todas as retentativas, ordenadas num heap pelo
+    # horário da próxima tentativa (backoff exponencial com jitter).
+    def __init__(self, logger=None, max_tentativas=6, atraso_inicial=0.5, atraso_maximo=30.0):
+        self.logger = logger
+        self.max_tentativas = max_tentativas
+        self.atraso_inicial = atraso_inicial
+        self.atraso_maximo = atraso_maximo
+        self._heap = []
+        self._pendentes = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.running = False
+
+    def start(self):
+        with self._cond:
+            if self.running:
+                return
+            self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            if not self.running:
+                return
+            self.running = False
+            self._heap = []
+            self._pendentes = {}
+            self._cond.notify_all()
+        self._thread.join(timeout=2)
+        self._thread = None
+
+    def pendentes(self):
+        with self._cond:
+            return len(self._pendentes)
+
+    def pendente(self, caminho):
+        with self._cond:
+            return caminho in self._pendentes
+
+    def agendar(self, caminho, funcao, tentativa=1):
+        # Eventos repetidos para um caminho já agendado são descartados.
+        if tentativa > self.max_tentativas:
+            if self.logger:
+                self.logger(f"❌ Desistindo de {caminho} após {self.max_tentativas} tentativas")
+            return False
+        atraso = min(self.atraso_maximo, self.atraso_inicial * 2 ** (tentativa - 1))
+        atraso = random.uniform(atraso / 2, atraso)
+        with self._cond:
+            if not self.running or caminho in self._pendentes:
+                return False
+            self._pendentes[caminho] = (tentativa, funcao)
+            heapq.heappush(self._heap, (time.monotonic() + atraso, next(self._seq), caminho))
+            self._cond.notify()
+        if self.logger:
+            self.logger(f"🔁 Nova tentativa para {os.path.basename(caminho)} em {atraso:.1f}s "
+                        f"({tentativa}/{self.max_tentativas})")
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.running:
+                    if self._heap:
+                        espera = self._heap[0][0] - time.monotonic()
+                        if espera <= 0:
+                            break
+                        self._cond.wait(espera)
+                    else:
+                        self._cond.wait()
+                if not self.running:
+                    return
+                _, _, caminho = heapq.heappop(self._heap)
+                tentativa, funcao = self._pendentes.pop(caminho)
+            try:
+                funcao(caminho, tentativa)
+            except Exception as e:
+                if self.logger:
+                    self.logger(f"❌ Erro na nova tentativa de {caminho}: {e}")
+
+
+
+# Formato do trace: cabeçalho TRACE_MAGICO seguido de registros
+# (instante, tipo, diretório, tamanho, len(origem), len(destino)) + caminhos em UTF-8.
+TRACE_MAGICO = b"ORGTRACE1\n"
+TRACE_REGISTRO = struct.Struct("<dB?qHH")
+TIPOS_EVENTO = ("created", "deleted", "modified", "moved", "closed", "opened", "closed_no_write")
+
+
+class GravadorEventos:
+    # Cada sessão grava num arquivo próprio ("trace-AAAAMMDD-HHMMSS.bin"), para
+    # que "Salvar e Recarregar" não apague o trace recém-gravado. Os registros
+    # são descarregados a cada DESCARGA_REGISTROS eventos ou DESCARGA_SEGUNDOS,
+    # para que um travamento perca no máximo esse trecho final.
+    DESCARGA_REGISTROS = 256
+    DESCARGA_SEGUNDOS = 1.0
+
+    def __init__(self, caminho):
+        base, ext = os.path.splitext(caminho)
+        sufixo = time.strftime("%Y%m%d-%H%M%S")
+        i = 0
+        while True:
+            self.caminho = f"{base}-{sufixo}{f'-{i}' if i else ''}{ext or '.bin'}"
+            try:
+                self._arquivo = open(self.caminho, "xb")
+                break
+            except FileExistsError:
+                i += 1
+        self._arquivo.write(TRACE_MAGICO)
+        self._inicio = time.monotonic()
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._ultima_descarga = self._inicio
+        self.total = 0
+
+    def gravar(self, event):
+        if event.event_type not in TIPOS_EVENTO:
+            return
+        origem = os.fsencode(event.src_path)
+        destino = os.fsencode(getattr(event, "dest_path", "") or "")
+        try:
+            tamanho = os.path.getsize(destino or origem)
+        except OSError:
+            tamanho = -1
+        registro = TRACE_REGISTRO.pack(time.monotonic() - self._inicio, TIPOS_EVENTO.index(event.event_type),
+                                       event.is_directory, tamanho, len(origem), len(destino))
+        with self._lock:
+            if self._arquivo:
+                self._arquivo.write(registro + origem + destino)
+                self.total += 1
+                self._pendentes += 1
+                if self._pendentes >= self.DESCARGA_REGISTROS \
+                        or time.monotonic() - self._ultima_descarga >= self.DESCARGA_SEGUNDOS:
+                    self._descarregar()
+
+    def descarregar(self):
+        with self._lock:
+            if self._arquivo and self._pendentes:
+                self._descarregar()
+
+    def _descarregar(self):
+        self._arquivo.flush()
+        self._pendentes = 0
+        self._ultima_descarga = time.monotonic()
+
+    def fechar(self):
+        with self._lock:
+            if self._arquivo:
+                self._arquivo.close()
+                self._arquivo = None
+
+
+def ler_trace(caminho):
+    with open(caminho, "rb") as f:
+        if f.read(len(TRACE_MAGICO)) != TRACE_MAGICO:
+            raise ValueError(f"Arquivo de trace inválido: {caminho}")
+        while True:
+            cabecalho = f.read(TRACE_REGISTRO.size)
+            if len(cabecalho) < TRACE_REGISTRO.size:
+                return
+            instante, tipo, diretorio, tamanho, n_origem, n_destino = TRACE_REGISTRO.unpack(cabecalho)
+            origem = os.fsdecode(f.read(n_origem))
+            destino = os.fsdecode(f.read(n_destino))
+            yield instante, TIPOS_EVENTO[tipo], diretorio, tamanho, origem, destino
+
+
+
+THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+THREAD_PRIORITY_LOWEST = -2
+
+
+class IndiceRetencao:
+    # Por pasta de categoria, um heap (idade, caminho) dos arquivos organizados,
+    # com contagem e tamanho total. A regra "dias" só olha o topo do heap, então
+    # o custo é proporcional aos arquivos que de fato expiram. "manter" e
+    # "max_gb" dependem da contagem/tamanho, que ficam errados se o usuário
+    # apagar ou mover arquivos à mão; por isso, enquanto o limite estiver
+    # estourado, o índice da pasta é conferido (um stat por arquivo indexado),
+    # no máximo uma vez por INTERVALO_PODA. Entre conferências esses limites
+    # esperam: apagar um pouco depois é melhor que apagar o arquivo errado.
+    # Regras por categoria em config.json, por exemplo:
+    #   "retencao": {"Outros": {"dias": 30, "acao": "apagar"},
+    #                "Torrents": {"manter": 20}, "Executáveis": {"max_gb": 5}}
+    # "acao" pode ser "arquivar" (padrão, move para Arquivados/<categoria>) ou "apagar".
+    INTERVALO = 60.0
+    INTERVALO_PODA = 60.0
+    LOTE = 100
+
+    def __init__(self, regras, logger=None, verificacao=None):
+        self.regras = regras or {}
+        self.logger = logger
+        self.verificacao = verificacao
+        self._pastas = {}
+        self._semear = []
+        self._ultima_poda = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self.running = False
+        self.expirados = 0
+
+    def start(self):
+        with self._cond:
+            if self.running:
+                return
+            self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            if not self.running:
+                return
+            self.running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=2)
+        self._thread = None
+
+    def regra(self, pasta_categoria):
+        return self.regras.get(os.path.basename(pasta_categoria))
+
+    def semear(self, pasta_monitorada):
+        # Única varredura: popula o índice com o que já estava organizado.
+        with self._cond:
+            self._semear.append(pasta_monitorada)
+            self._cond.notify()
+
+    def registrar(self, caminho):
+        pasta = os.path.dirname(caminho)
+        regra = self.regra(pasta)
+        if not regra:
+            return
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            return
+        with self._cond:
+            self._adicionar(pasta, caminho, max(st.st_mtime, st.st_ctime), st.st_size)
+            if self._excede(self._pastas[pasta], regra):
+                self._cond.notify()
+
+    def _excede(self, estado, regra):
+        manter = regra.get("manter")
+        max_gb = regra.get("max_gb")
+        return (manter is not None and len(estado["arquivos"]) > manter) \
+            or (bool(max_gb) and estado["bytes"] > max_gb * 1e9)
+
+    def _podar(self, pasta):
+        # Arquivos apagados, renomeados ou movidos pelo usuário continuariam
+        # contando para "manter"/"max_gb" e fariam a regra apagar arquivos que
+        # deveriam ficar. Só roda com um desses limites ultrapassado e no máximo
+        # uma vez por INTERVALO_PODA (ver comentário da classe).
+        with self._cond:
+            arquivos = list(self._pastas[pasta]["arquivos"].items())
+        atualizados = []
+        for caminho, registro in arquivos:
+            try:
+                st = os.stat(caminho)
+            except OSError:
+                atualizados.append((caminho, registro, None))
+                continue
+            atual = (max(st.st_mtime, st.st_ctime), st.st_size)
+            if atual != registro:
+                atualizados.append((caminho, registro, atual))
+        with self._cond:
+            estado = self._pastas[pasta]
+            for caminho, registro, atual in atualizados:
+                if estado["arquivos"].get(caminho) != registro:
+                    continue
+                if atual is None:
+                    del estado["arquivos"][caminho]
+                    estado["bytes"] -= registro[1]
+                else:
+                    self._adicionar(pasta, caminho, *atual)
+
+    def _adicionar(self, pasta, caminho, idade, tamanho):
+        estado = self._pastas.setdefault(pasta, {"heap": [], "arquivos": {}, "bytes": 0})
+        anterior = estado["arquivos"].get(caminho)
+        if anterior:
+            estado["bytes"] -= anterior[1]
+        estado["arquivos"][caminho] = (idade, tamanho)
+        estado["bytes"] += tamanho
+        heapq.heappush(estado["heap"], (idade, caminho))
+
+    def _semear_pasta(self, pasta_monitorada):
+        for categoria in self.regras:
+            pasta = os.path.join(pasta_monitorada, categoria)
+            try:
+                entradas = list(os.scandir(pasta))
+            except OSError:
+                continue
+            for entrada in entradas:
+                try:
+                    if not entrada.is_file():
+                        continue
+                    st = entrada.stat()
+                except OSError:
+                    continue
+                with self._cond:
+                    if entrada.path not in self._pastas.get(pasta, {}).get("arquivos", {}):
+                        self._adicionar(pasta, entrada.path, max(st.st_mtime, st.st_ctime), st.st_size)
+
+    def _expirados(self, pasta, regra, agora, limites=True):
+        # Entradas de arquivos reorganizados ficam no heap e são descartadas aqui.
+        # Sem "limites", só a regra de idade vale (índice ainda não conferido).
+        estado = self._pastas[pasta]
+        heap, arquivos = estado["heap"], estado["arquivos"]
+        limite_idade = agora - regra["dias"] * 86400 if regra.get("dias") else None
+        manter = regra.get("manter") if limites else None
+        max_bytes = regra["max_gb"] * 1e9 if limites and regra.get("max_gb") else None
+        expirados = []
+        while heap and len(expirados) < self.LOTE:
+            idade, caminho = heap[0]
+            atual = arquivos.get(caminho)
+            if atual is None or atual[0] != idade:
+                heapq.heappop(heap)
+                continue
+            if limite_idade is not None and idade < limite_idade:
+                motivo = f"mais de {regra['dias']} dias"
+            elif manter is not None and len(arquivos) > manter:
+                motivo = f"além dos {manter} mais recentes"
+            elif max_bytes is not None and estado["bytes"] > max_bytes:
+                motivo = f"acima de {regra['max_gb']} GB"
+            else:
+                break
+            # A idade foi gravada ao indexar: um arquivo editado desde então
+            # volta ao heap com a idade nova em vez de expirar.
+            heapq.heappop(heap)
+            try:
+                st = os.stat(caminho)
+            except OSError:
+                del arquivos[caminho]
+                estado["bytes"] -= atual[1]
+                continue
+            if (max(st.st_mtime, st.st_ctime), st.st_size) != atual:
+                self._adicionar(pasta, caminho, max(st.st_mtime, st.st_ctime), st.st_size)
+                continue
+            del arquivos[caminho]
+            estado["bytes"] -= atual[1]
+            expirados.append((caminho, motivo))
+        return expirados
+
+    def _aplicar(self, pasta, regra, caminho, motivo):
+        if not os.path.isfile(caminho):
+            return
+        categoria = os.path.basename(pasta)
+        if regra.get("acao", "arquivar") == "apagar":
+            try:
+                os.remove(caminho)
+            except OSError as e:
+                if self.logger:
+                    self.logger(f"❌ Retenção: erro ao apagar {caminho}: {e}")
+                return
+            if self.logger:
+                self.logger(f"🗑️ Retenção: {os.path.basename(caminho)} apagado ({categoria}, {motivo})")
+        else:
+            arquivo = os.path.join(os.path.dirname(pasta), "Arquivados", categoria)
+            # Arquivados costuma ficar num NAS/disco externo: vale a mesma verificação.
+            if not mover_arquivo(caminho, arquivo, verificacao=self.verificacao):
+                if self.logger:
+                    self.logger(f"❌ Retenção: erro ao arquivar {caminho}")
+                return
+            if self.logger:
+                self.logger(f"🗄️ Retenção: {os.path.basename(caminho)} arquivado ({categoria}, {motivo})")
+        self.expirados += 1
+
+    def _ciclo(self):
+        agora = time.time()
+        pendente = False
+        for pasta in list(self._pastas):
+            regra = self.regra(pasta)
+            if not regra:
+                continue
+            with self._cond:
+                excede = self._excede(self._pastas[pasta], regra)
+            limites = False
+            if excede:
+                instante = time.monotonic()
+                if instante - self._ultima_poda.get(pasta, -self.INTERVALO_PODA) >= self.INTERVALO_PODA:
+                    self._ultima_poda[pasta] = instante
+                    self._podar(pasta)
+                    limites = True
+            with self._cond:
+                expirados = self._expirados(pasta, regra, agora, limites)
+            pendente = pendente or len(expirados) >= self.LOTE
+            for caminho, motivo in expirados:
+                if not self.running:
+                    return False
+                self._aplicar(pasta, regra, caminho, motivo)
+        return pendente
+
+    def _baixar_prioridade(self):
+        # Prioridade baixa para não competir com a organização. No Windows o
+        # modo "background" também reduz a prioridade de E/S da thread.
+        if sys.platform == "win32":
+            try:
+                import ctypes
+                from ctypes import wintypes
+
+                kernel32 = ctypes.windll.kernel32
+                kernel32.GetCurrentThread.restype = wintypes.HANDLE
+                kernel32.SetThreadPriority.argtypes = (wintypes.HANDLE, ctypes.c_int)
+                kernel32.SetThreadPriority.restype = wintypes.BOOL
+                thread = kernel32.GetCurrentThread()
+                if not kernel32.SetThreadPriority(thread, THREAD_MODE_BACKGROUND_BEGIN):
+                    kernel32.SetThreadPriority(thread, THREAD_PRIORITY_LOWEST)
+            except Exception:
+                pass
+        elif sys.platform.startswith("linux") and hasattr(threading, "get_native_id"):
+            # No Linux cada thread tem seu próprio nice.
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+            except OSError:
+                pass
+
+    def _run(self):
+        self._baixar_prioridade()
+        while True:
+            with self._cond:
+                if not self.running:
+                    return
+                semear, self._semear = self._semear, []
+            for pasta in semear:
+                self._semear_pasta(pasta)
+            try:
+                pendente = self._ciclo()
+            except Exception as e:
+                pendente = False
+                if self.logger:
+                    self.logger(f"❌ Erro na retenção: {e}")
+            with self._cond:
+                if self.running and not self._semear:
+                    self._cond.wait(1.0 if pendente else self.INTERVALO)
 
 
 
 class OrganizadorHandler(FileSystemEventHandler):
-    def __init__(self, categorias, logger=None):
+    def __init__(self, categorias, logger=None, retentativas=None, gravador=None, verificacao=None,
+                 retencao=None):
         super().__init__()
         self.categorias = categorias
         self.logger = logger
+        self.verificacao = verificacao
+        self.retencao = retencao
+        self.retentativas = retentativas
+        self.gravador = gravador
+        self._em_andamento = set()
+        self._lock = threading.Lock()
+
+    def on_any_event(self, event):
+        if self.gravador:
+            self.gravador.gravar(event)
 
     def on_created(self, event):
         if event.is_directory:
@@ -93,71 +660,361 @@ class OrganizadorHandler(FileSystemEventHandler):
         time.sleep(0.2)
         self.organizar(event.dest_path)
 
-    def organizar(self, arquivo):
+    def organizar(self, arquivo, tentativa=0):
+        # Retorna True só quando o arquivo foi de fato movido nesta chamada.
+        if self.retentativas and tentativa == 0 and self.retentativas.pendente(arquivo):
+            return False
+        # Evento ao vivo e reconciliação podem chegar juntos para o mesmo arquivo.
+        with self._lock:
+            if arquivo in self._em_andamento:
+                return False
+            self._em_andamento.add(arquivo)
+        try:
+            return os.path.isfile(arquivo) and self._organizar(arquivo, tentativa)
+        finally:
+            with self._lock:
+                self._em_andamento.discard(arquivo)
+
+    def _organizar(self, arquivo, tentativa):
         _, ext = os.path.splitext(arquivo)
         ext = ext.lower()
+        pasta_destino = os.path.join(os.path.dirname(arquivo), "Outros")
         for categoria, extensoes in self.categorias.items():
             if ext in extensoes:
-                mover_arquivo(arquivo, os.path.join(os.path.dirname(arquivo), categoria), self.logger)
-                return
-        mover_arquivo(arquivo, os.path.join(os.path.dirname(arquivo), "Outros"), self.logger)
+                pasta_destino = os.path.join(os.path.dirname(arquivo), categoria)
+                break
+        destino = mover_arquivo(arquivo, pasta_destino, self.logger, self.verificacao)
+        if destino:
+            if self.retencao:
+                self.retencao.registrar(destino)
+            return True
+        # Arquivo ainda em uso (antivírus, download em andamento): tenta depois.
+        if self.retentativas and os.path.exists(arquivo):
+            self.retentativas.agendar(arquivo, self.organizar, tentativa + 1)
+        return False
+
+
+
+# O watchdog descarta em silêncio o aviso de estouro da fila do kernel
+# (IN_Q_OVERFLOW no Linux, leitura vazia do ReadDirectoryChangesW no Windows).
+# Estes ganchos repassam o aviso para quem estiver inscrito.
+_ouvintes_overflow = []
+_detector_overflow_instalado = False
+_detector_overflow_ativo = False
+
+
+def _avisar_overflow(pasta):
+    for ouvinte in list(_ouvintes_overflow):
+        try:
+            ouvinte(os.fsdecode(pasta))
+        except Exception:
+            pass
+
+
+def _instalar_detector_overflow():
+    global _detector_overflow_instalado, _detector_overflow_ativo
+    if _detector_overflow_instalado:
+        return _detector_overflow_ativo
+    _detector_overflow_instalado = True
+    try:
+        from watchdog.observers.inotify_c import Inotify, InotifyConstants
+
+        parse_original = Inotify._parse_event_buffer
+
+        def _parse_event_buffer(event_buffer):
+            for wd, mask, cookie, name in parse_original(event_buffer):
+                if wd == -1 and mask & InotifyConstants.IN_Q_OVERFLOW:
+                    inotify = getattr(threading.current_thread(), "_inotify", None)
+                    if inotify is not None:
+                        _avisar_overflow(inotify.path)
+                yield wd, mask, cookie, name
+
+        Inotify._parse_event_buffer = staticmethod(_parse_event_buffer)
+        _detector_overflow_ativo = True
+    except Exception:
+        pass
+    try:
+        from watchdog.observers import winapi
+
+        ler_original = winapi.read_directory_changes
+
+        def read_directory_changes(handle, path, *args, **kwargs):
+            buf, nbytes = ler_original(handle, path, *args, **kwargs)
+            if nbytes == 0:
+                _avisar_overflow(path)
+            return buf, nbytes
+
+        winapi.read_directory_changes = read_directory_changes
+        _detector_overflow_ativo = True
+    except Exception:
+        pass
+    return _detector_overflow_ativo
 
 
 
 class MonitorManager:
+    INTERVALO_RESCAN = 5.0
+    LOTE_RESCAN = 50
+
     def __init__(self, logger=None):
-        self.observers = []
+        self.observers = {}
         self.thread = None
         self.running = False
         self.logger = logger
+        self.retentativas = AgendadorRetentativas(logger=logger)
+        self.gravador = None
+        self.retencao = None
+        self._lock = threading.Lock()
+        self._cond_rescan = threading.Condition(self._lock)
+        self._thread_rescan = None
+        self._parar = threading.Event()
+        self._handlers = {}
+        self._rescans_pedidos = {}
+        self._rescans = {}
+        self._ultimo_rescan = {}
+        self._ultima_tentativa = {}
+        self.contadores = {"overflows": 0, "observers_reiniciados": 0, "rescans": 0, "arquivos_recuperados": 0}
+        _instalar_detector_overflow()
+        _ouvintes_overflow.append(self._on_overflow)
+
+    def retentativas_pendentes(self):
+        return self.retentativas.pendentes()
 
-    def start(self, pastas, categorias):
+    def metricas(self):
+        with self._lock:
+            metricas = dict(self.contadores)
+        metricas["retentativas_pendentes"] = self.retentativas.pendentes()
+        metricas["expirados_retencao"] = self.retencao.expirados if self.retencao else 0
+        return metricas
+
+    def start(self, pastas, categorias, trace=None, verificacao=None, retencao=None):
         if self.running:
             return
         self.running = True
+        self.retentativas.start()
+        if verificacao and verificacao not in MODOS_VERIFICACAO:
+            if self.logger:
+                self.logger(f"⚠️ verificar_copia inválido: {verificacao!r} (use \"completo\" ou \"amostras\"); "
+                            f"cópias não serão verificadas")
+            verificacao = None
+        if retencao:
+            self.retencao = IndiceRetencao(retencao, logger=self.logger, verificacao=verificacao)
+            self.retencao.start()
+        if trace:
+            try:
+                self.gravador = GravadorEventos(trace)
+                if self.logger:
+                    self.logger(f"⏺️ Gravando eventos em {self.gravador.caminho}")
+            except OSError as e:
+                if self.logger:
+                    self.logger(f"⚠️ Não foi possível gravar o trace: {e}")
         
-        self.thread = threading.Thread(target=self._run, args=(pastas, categorias), daemon=True)
+        if not _instalar_detector_overflow() and self.logger:
+            # Os ganchos dependem de detalhes internos do watchdog; se mudarem, avisa.
+            self.logger("⚠️ Detecção de estouro da fila indisponível nesta versão do watchdog")
+        # Um evento por execução: se um stop() anterior desistiu de esperar
+        # uma thread ocupada, ela sai ao acordar em vez de voltar a rodar.
+        self._parar = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(pastas, categorias, verificacao, self._parar),
+                                       daemon=True)
         self.thread.start()
+        self._thread_rescan = threading.Thread(target=self._reconciliar, args=(self._parar,), daemon=True)
+        self._thread_rescan.start()
         if self.logger:
             self.logger("🟢 Monitoramento iniciado")
 
-    def _run(self, pastas, categorias):
-        try:
-            for pasta in pastas:
-                if not os.path.exists(pasta):
-                    if self.logger:
-                        self.logger(f"⚠️ Pasta não encontrada: {pasta}")
-                    continue
-                handler = OrganizadorHandler(categorias, logger=self.logger)
-                obs = Observer()
-                obs.schedule(handler, pasta, recursive=False)
-                obs.start()
-                self.observers.append(obs)
+    def _run(self, pastas, categorias, verificacao, parar):
+        for pasta in pastas:
+            self._handlers[pasta] = OrganizadorHandler(categorias, logger=self.logger, retentativas=self.retentativas,
+                                                       gravador=self.gravador, verificacao=verificacao,
+                                                       retencao=self.retencao)
+            if self.retencao:
+                self.retencao.semear(pasta)
+            if not os.path.exists(pasta):
+                if self.logger:
+                    self.logger(f"⚠️ Pasta não encontrada: {pasta}")
+                continue
+            self._observar(pasta)
+
+        while not parar.is_set():
+            try:
+                if self.gravador:
+                    # Sem eventos novos, o final do trace ficaria só no buffer.
+                    self.gravador.descarregar()
+                self._supervisionar()
+            except Exception as e:
                 if self.logger:
-                    self.logger(f"✅ Monitorando: {pasta}")
-            
-            while self.running:
-                time.sleep(0.5)
+                    self.logger(f"❌ Erro no monitor: {e}")
+            parar.wait(0.5)
+
+    def _observar(self, pasta):
+        try:
+            obs = Observer()
+            obs.schedule(self._handlers[pasta], pasta, recursive=False)
+            obs.start()
         except Exception as e:
             if self.logger:
-                self.logger(f"❌ Erro no monitor: {e}")
+                self.logger(f"❌ Erro ao monitorar {pasta}: {e}")
+            return False
+        with self._lock:
+            if not self.running:
+                obs.stop()
+                return False
+            self.observers[pasta] = obs
+        if self.logger:
+            self.logger(f"✅ Monitorando: {pasta}")
+        return True
+
+    def _ativo(self, obs):
+        return obs.is_alive() and all(emitter.is_alive() for emitter in obs.emitters)
+
+    def _supervisionar(self):
+        # Observers que morreram ou pastas que sumiram e voltaram (unidade
+        # desmontada, por exemplo) perdem eventos: recria e reconcilia.
+        agora = time.monotonic()
+        for pasta in self._handlers:
+            with self._lock:
+                obs = self.observers.get(pasta)
+            if obs is not None and self._ativo(obs):
+                continue
+            if obs is not None:
+                with self._lock:
+                    self.observers.pop(pasta, None)
+                    self.contadores["observers_reiniciados"] += 1
+                try:
+                    obs.stop()
+                except Exception:
+                    pass
+                if self.logger:
+                    self.logger(f"⚠️ Monitor de {pasta} parou inesperadamente")
+            if agora - self._ultima_tentativa.get(pasta, -self.INTERVALO_RESCAN) < self.INTERVALO_RESCAN:
+                continue
+            self._ultima_tentativa[pasta] = agora
+            if os.path.isdir(pasta) and self._observar(pasta):
+                self.solicitar_rescan(pasta, "monitor reiniciado")
+
+        with self._lock:
+            prontas = [pasta for pasta, motivo in self._rescans_pedidos.items()
+                       if pasta not in self._rescans
+                       and agora - self._ultimo_rescan.get(pasta, -self.INTERVALO_RESCAN) >= self.INTERVALO_RESCAN]
+            for pasta in prontas:
+                motivo = self._rescans_pedidos.pop(pasta)
+                self._ultimo_rescan[pasta] = agora
+                self._rescans[pasta] = self._varrer(pasta, self._handlers[pasta])
+                self.contadores["rescans"] += 1
+                if self.logger:
+                    self.logger(f"🔄 Reconciliando {pasta} ({motivo})")
+            if prontas:
+                self._cond_rescan.notify()
+
+    def _reconciliar(self, parar):
+        # Thread própria: uma cópia verificada demorada durante a reconciliação
+        # não atrasa a supervisão dos observers das outras pastas.
+        while True:
+            with self._cond_rescan:
+                while not parar.is_set() and not self._rescans:
+                    self._cond_rescan.wait()
+                if parar.is_set():
+                    return
+                rescans = list(self._rescans.items())
+            for pasta, varredura in rescans:
+                for _ in range(self.LOTE_RESCAN):
+                    if parar.is_set():
+                        return
+                    try:
+                        fim = next(varredura, None) is None
+                    except Exception as e:
+                        fim = True
+                        if self.logger:
+                            self.logger(f"❌ Erro ao reconciliar {pasta}: {e}")
+                    if fim:
+                        with self._lock:
+                            if self._rescans.get(pasta) is varredura:
+                                del self._rescans[pasta]
+                        break
+
+    def _varrer(self, pasta, handler):
+        # Varredura incremental: cada next() organiza no máximo um arquivo.
+        try:
+            entradas = list(os.scandir(pasta))
+        except OSError as e:
+            if self.logger:
+                self.logger(f"⚠️ Não foi possível reconciliar {pasta}: {e}")
+            return
+        for entrada in entradas:
+            try:
+                # Arquivos recém-alterados ainda serão tratados pelos eventos ao vivo.
+                if not entrada.is_file() or time.time() - entrada.stat().st_mtime < 2:
+                    yield entrada.path
+                    continue
+            except OSError:
+                yield entrada.path
+                continue
+            if handler.organizar(entrada.path):
+                with self._lock:
+                    self.contadores["arquivos_recuperados"] += 1
+            yield entrada.path
+
+    def solicitar_rescan(self, pasta, motivo):
+        with self._lock:
+            if not self.running or pasta not in self._handlers:
+                return
+            self._rescans_pedidos.setdefault(pasta, motivo)
+
+    def _on_overflow(self, caminho):
+        if not self.running:
+            return
+        caminho = os.path.normcase(os.path.abspath(caminho))
+        for pasta in list(self._handlers):
+            if os.path.normcase(os.path.abspath(pasta)) == caminho:
+                with self._lock:
+                    self.contadores["overflows"] += 1
+                if self.logger:
+                    self.logger(f"⚠️ Fila de eventos estourou em {pasta}; eventos podem ter sido perdidos")
+                self.solicitar_rescan(pasta, "fila de eventos estourou")
+                return
 
     def stop(self):
         if not self.running:
             return
-        self.running = False
-        for obs in self.observers:
+        with self._lock:
+            self.running = False
+            observers = list(self.observers.values())
+            self.observers = {}
+            self._rescans_pedidos = {}
+            self._rescans = {}
+            self._parar.set()
+            self._cond_rescan.notify_all()
+        for obs in observers:
             try:
                 obs.stop()
             except Exception:
                 pass
-        for obs in self.observers:
+        for obs in observers:
             try:
                 obs.join()
             except Exception:
                 pass
-        self.observers = []
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        if self._thread_rescan:
+            self._thread_rescan.join(timeout=2)
+            self._thread_rescan = None
+        self._handlers = {}
+        self.retentativas.stop()
+        if self.retencao:
+            self.retencao.stop()
+        if self.gravador:
+            self.gravador.fechar()
+            if self.logger:
+                self.logger(f"⏹️ Trace salvo: {self.gravador.caminho} ({self.gravador.total} eventos)")
+            self.gravador = None
         if self.logger:
+            m = self.metricas()
+            self.logger(f"📊 Estouros de fila: {m['overflows']} | Reconciliações: {m['rescans']} "
+                        f"| Observers reiniciados: {m['observers_reiniciados']} "
+                        f"| Expirados pela retenção: {m['expirados_retencao']}")
             self.logger("🔴 Monitoramento parado")
 
 
@@ -280,7 +1137,10 @@ class App(tk.Tk):
         if self.monitor.running:
             self.monitor.stop()
             time.sleep(0.2)
-            self.monitor.start(self.config_data['pastas_para_monitorar'], self.config_data['categorias'])
+            self.monitor.start(self.config_data['pastas_para_monitorar'], self.config_data['categorias'],
+                               trace=self.config_data.get('gravar_trace'),
+                               verificacao=self.config_data.get('verificar_copia'),
+                               retencao=self.config_data.get('retencao'))
             self.status_var.set('Monitorando')
         else:
             self.log('⚠️ Monitor está parado. Clique em Iniciar Monitoramento para ativar.')
@@ -296,7 +1156,9 @@ class App(tk.Tk):
             if not pastas:
                 messagebox.showwarning('Aviso', 'Nenhuma pasta selecionada para monitorar.')
                 return
-            self.monitor.start(pastas, categorias)
+            self.monitor.start(pastas, categorias, trace=self.config_data.get('gravar_trace'),
+                               verificacao=self.config_data.get('verificar_copia'),
+                               retencao=self.config_data.get('retencao'))
             self.status_var.set('Monitorando')
             self.btn_start.config(text='Parar Monitoramento')
 
@@ -0,0 +1,126 @@
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from main import CONFIG_PATH, DEFAULT_CONFIG, OrganizadorHandler, ler_trace
+
+
+def ler_categorias():
+    # Ao contrário de carregar_config(), nunca grava: a reprodução não deve
+    # sobrescrever o config.json do usuário.
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            return json.load(f).get("categorias") or DEFAULT_CONFIG["categorias"]
+    except (OSError, ValueError, AttributeError):
+        return DEFAULT_CONFIG["categorias"]
+
+
+def criar_arquivo(caminho, tamanho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "wb") as f:
+        if tamanho > 0:
+            f.truncate(tamanho)
+
+
+class Reprodutor:
+    def __init__(self, categorias, pasta_rascunho, velocidade=1.0, perfil=False, logger=print):
+        self.handler = OrganizadorHandler(categorias, logger=logger)
+        self.pasta_rascunho = Path(pasta_rascunho)
+        self.velocidade = velocidade
+        self.logger = logger
+        self.pastas = {}
+        # Um perfil por etapa: preparar (recriar o arquivo) e organizar (motor).
+        self.perfis = {"preparar": cProfile.Profile(), "organizar": cProfile.Profile()} if perfil else {}
+        self.tempos = {"preparar": 0.0, "organizar": 0.0}
+
+    def mapear(self, caminho):
+        if not caminho:
+            return caminho
+        pasta, nome = os.path.split(caminho)
+        if pasta not in self.pastas:
+            self.pastas[pasta] = self.pasta_rascunho / f"pasta{len(self.pastas)}"
+        return str(self.pastas[pasta] / nome)
+
+    def _etapa(self, nome, funcao, *args):
+        perfil = self.perfis.get(nome)
+        inicio = time.perf_counter()
+        if perfil:
+            perfil.enable()
+        try:
+            return funcao(*args)
+        finally:
+            if perfil:
+                perfil.disable()
+            self.tempos[nome] += time.perf_counter() - inicio
+
+    def _preparar(self, tipo, tamanho, origem, destino):
+        if tipo == "created":
+            criar_arquivo(origem, tamanho)
+            return origem
+        if tipo == "moved":
+            if not os.path.exists(origem):
+                criar_arquivo(origem, tamanho)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(origem, destino)
+            return destino
+        if tipo == "deleted" and os.path.exists(origem):
+            os.remove(origem)
+        return None
+
+    def reproduzir(self, trace):
+        total = 0
+        inicio = time.monotonic()
+        for instante, tipo, diretorio, tamanho, origem, destino in ler_trace(trace):
+            if self.velocidade > 0:
+                espera = instante / self.velocidade - (time.monotonic() - inicio)
+                if espera > 0:
+                    time.sleep(espera)
+            total += 1
+            if diretorio:
+                continue
+            arquivo = self._etapa("preparar", self._preparar, tipo, tamanho, self.mapear(origem), self.mapear(destino))
+            if arquivo:
+                self._etapa("organizar", self.handler.organizar, arquivo)
+        return total
+
+    def relatorio(self, linhas=15):
+        for nome, tempo in self.tempos.items():
+            self.logger(f"⏱️ {nome}: {tempo:.3f}s")
+        for nome, perfil in self.perfis.items():
+            self.logger(f"\n=== Perfil: {nome} ===")
+            pstats.Stats(perfil).sort_stats("cumulative").print_stats(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduz um trace gravado pelo Organizador em uma pasta de rascunho.")
+    parser.add_argument("trace", help="arquivo gravado com a opção 'gravar_trace' do config.json (um por sessão)")
+    parser.add_argument("--pasta", help="pasta de rascunho (padrão: pasta temporária, apagada ao final)")
+    parser.add_argument("--velocidade", type=float, default=1.0,
+                        help="fator de aceleração; 0 reproduz o mais rápido possível")
+    parser.add_argument("--perfil", action="store_true", help="perfila cada etapa com cProfile")
+    parser.add_argument("--silencioso", action="store_true", help="não mostra o log do organizador")
+    args = parser.parse_args()
+
+    categorias = ler_categorias()
+    pasta = args.pasta or tempfile.mkdtemp(prefix="organizador_trace_")
+    reprodutor = Reprodutor(categorias, pasta, velocidade=args.velocidade, perfil=args.perfil,
+                            logger=(lambda msg: None) if args.silencioso else print)
+    try:
+        inicio = time.perf_counter()
+        total = reprodutor.reproduzir(args.trace)
+        print(f"✅ {total} eventos reproduzidos em {time.perf_counter() - inicio:.3f}s")
+        reprodutor.logger = print
+        reprodutor.relatorio()
+    finally:
+        if not args.pasta:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
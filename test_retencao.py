@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from main import IndiceRetencao
+
+
+class TestRetencao(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.torrents = os.path.join(self.pasta, "Torrents")
+        os.makedirs(self.torrents)
+        self.indice = IndiceRetencao({"Torrents": {"manter": 3, "acao": "apagar"}})
+        # O ciclo é chamado direto, sem a thread de fundo.
+        self.indice.running = True
+        self.agora = time.time()
+
+    def tearDown(self):
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+    def criar(self, nome, ordem):
+        caminho = os.path.join(self.torrents, nome)
+        open(caminho, "w").close()
+        os.utime(caminho, (self.agora + ordem * 10, self.agora + ordem * 10))
+        self.indice.registrar(caminho)
+        return caminho
+
+    def test_manter_ignora_arquivos_apagados_pelo_usuario(self):
+        f0 = self.criar("f0.torrent", 0)
+        f1 = self.criar("f1.torrent", 1)
+        f2 = self.criar("f2.torrent", 2)
+        os.remove(f1)
+        os.remove(f2)
+        f3 = self.criar("f3.torrent", 3)
+        self.indice._ciclo()
+        self.assertTrue(os.path.exists(f0))
+        self.assertTrue(os.path.exists(f3))
+        self.assertEqual(self.indice.expirados, 0)
+
+    def test_manter_apaga_o_mais_antigo(self):
+        f0 = self.criar("f0.torrent", 0)
+        for i in range(1, 4):
+            self.criar(f"f{i}.torrent", i)
+        self.indice._ciclo()
+        self.assertFalse(os.path.exists(f0))
+        self.assertEqual(sorted(os.listdir(self.torrents)), ["f1.torrent", "f2.torrent", "f3.torrent"])
+
+    def test_manter_espera_a_proxima_conferencia_do_indice(self):
+        for i in range(4):
+            self.criar(f"f{i}.torrent", i)
+        self.indice._ciclo()
+        self.criar("f4.torrent", 4)
+        self.indice._ciclo()
+        self.assertEqual(len(os.listdir(self.torrents)), 4)
+        self.indice._ultima_poda.clear()
+        self.indice._ciclo()
+        self.assertEqual(sorted(os.listdir(self.torrents)), ["f2.torrent", "f3.torrent", "f4.torrent"])
+
+    def test_dias_nao_apaga_arquivo_editado_depois_de_indexado(self):
+        outros = os.path.join(self.pasta, "Outros")
+        os.makedirs(outros)
+        indice = IndiceRetencao({"Outros": {"dias": 30, "acao": "apagar"}})
+        indice.running = True
+        caminho = os.path.join(outros, "velho.bin")
+        open(caminho, "w").close()
+        velho = self.agora - 40 * 86400
+        with indice._cond:
+            indice._adicionar(outros, caminho, velho, 0)
+        with open(caminho, "w") as f:
+            f.write("editado hoje")
+        indice._ciclo()
+        self.assertTrue(os.path.exists(caminho))
+        self.assertEqual(indice.expirados, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()